@@ -1,10 +1,15 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
-from sqlalchemy import create_engine, desc
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from cachetools import TTLCache
+from contextlib import closing
 from datetime import datetime, timedelta
 import os
 import json
+import threading
+import time
+import orjson
 
 # Import your existing models
 from models import User, Base
@@ -13,75 +18,207 @@ app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "https://esemicolonr.github.io"}})
 
 # Database connection
+# Get database connection info from environment variables or use defaults
+db_user = os.environ.get('DB_USER', 'postgres')
+db_password = os.environ.get('DB_PASSWORD', 'postgres')
+db_host = os.environ.get('DB_HOST', 'localhost')
+db_port = os.environ.get('DB_PORT', '5432')
+db_name = os.environ.get('DB_NAME', 'loyalty_points')
+
+connection_string = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+# Build the engine once per process so requests reuse pooled connections
+# instead of paying for a new TCP + auth handshake every time
+engine = create_engine(
+    connection_string,
+    pool_size=int(os.environ.get('DB_POOL_SIZE', 6)),
+    max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+    pool_pre_ping=True,
+    # Bulk INSERTs go out as multi-row VALUES and other executemany() calls
+    # (UPDATE/DELETE) through psycopg2's execute_batch
+    executemany_mode='values_plus_batch',
+    insertmanyvalues_page_size=1000
+)
+Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+
+# Read-only traffic (the public leaderboard) can go to a streaming replica so
+# it never competes with the livestream writes on the primary. Without
+# DB_REPLICA_HOST set, reads fall back to the primary engine.
+db_replica_host = os.environ.get('DB_REPLICA_HOST')
+if db_replica_host:
+    db_replica_port = os.environ.get('DB_REPLICA_PORT', db_port)
+    replica_engine = create_engine(
+        f"postgresql://{db_user}:{db_password}@{db_replica_host}:{db_replica_port}/{db_name}",
+        pool_size=int(os.environ.get('DB_POOL_SIZE', 6)),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        pool_pre_ping=True
+    )
+else:
+    replica_engine = engine
+
+# Top 25 recently updated non-eliminated users by points. The leaderboard is
+# the hottest read and only needs a few scalar columns, so it goes straight to
+# the DB-API cursor and skips SQL compilation and ORM/Core row processing.
+LEADERBOARD_PAGE_SIZE = 25
+_LEADERBOARD_SQL = (
+    # Points are rounded to 1 decimal place in the query and cast back to
+    # float8 so the driver hands back floats that serialize as-is. The raw
+    # points and id are kept for the next page's cursor. ORDER BY names the
+    # table column, since a bare "points" would sort by the alias.
+    "SELECT username, ROUND(points::numeric, 1)::float8 AS rounded_points, points, id FROM users "
+    "WHERE updated_at >= %s AND is_eliminated = false{} "
+    f"ORDER BY users.points DESC, users.id DESC LIMIT {LEADERBOARD_PAGE_SIZE}"
+)
+LEADERBOARD_SQL = _LEADERBOARD_SQL.format('')
+# Later pages use keyset pagination: seek past the last row of the previous
+# page instead of OFFSET, so every page costs the same however deep it is
+LEADERBOARD_AFTER_SQL = _LEADERBOARD_SQL.format(' AND (points, id) < (%s, %s)')
+
+# The leaderboard is public and the same for every caller, so keep each
+# serialized response for a few seconds (keyed by the query args) instead of hitting
+# the database on every request
+leaderboard_cache = TTLCache(maxsize=256, ttl=int(os.environ.get('LEADERBOARD_CACHE_TTL', 10)))
+leaderboard_cache_lock = threading.Lock()
+
+# Status/test timestamps only need second precision, so the ISO string is
+# rebuilt at most once per second instead of on every call
+_timestamp = None
+_timestamp_refreshed = 0.0
+
+def current_timestamp():
+    global _timestamp, _timestamp_refreshed
+    tick = time.monotonic()
+    if _timestamp is None or tick - _timestamp_refreshed >= 1.0:
+        _timestamp = datetime.utcnow().isoformat(timespec='seconds')
+        _timestamp_refreshed = tick
+    return _timestamp
+
 def get_db_connection():
-    # Get database connection info from environment variables or use defaults
-    db_user = os.environ.get('DB_USER', 'postgres')
-    db_password = os.environ.get('DB_PASSWORD', 'postgres')
-    db_host = os.environ.get('DB_HOST', 'localhost')
-    db_port = os.environ.get('DB_PORT', '5432')
-    db_name = os.environ.get('DB_NAME', 'loyalty_points')
-    
-    connection_string = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    engine = create_engine(connection_string)
-    Session = sessionmaker(bind=engine)
     return Session()
 
+def stream_rows(session, stmt, batch_size=1000):
+    # For large scans (e.g. transaction history). Uses a server-side cursor and
+    # fetches batch_size rows at a time so worker memory stays flat no matter
+    # how many rows the query returns
+    result = session.execute(stmt, execution_options={'stream_results': True, 'yield_per': batch_size})
+    try:
+        yield from result
+    finally:
+        result.close()
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    # Return the request's connection to the pool
+    Session.remove()
+
+# Dev-only profiling: set PROFILE_DIR (and pip install pyinstrument) to write a
+# pyinstrument report for every /api/* request into that directory
+profile_dir = os.environ.get('PROFILE_DIR')
+if profile_dir:
+    from pyinstrument import Profiler
+    
+    os.makedirs(profile_dir, exist_ok=True)
+    
+    @app.before_request
+    def start_profiler():
+        if request.path.startswith('/api/'):
+            g.profiler = Profiler()
+            g.profiler.start()
+    
+    @app.after_request
+    def stop_profiler(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            name = f"{request.path.strip('/').replace('/', '_')}-{time.time():.0f}-{id(profiler)}.html"
+            with open(os.path.join(profile_dir, name), 'w') as f:
+                f.write(profiler.output_html())
+        return response
+
 # Endpoint to get active user leaderboard
 @app.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
     try:
-        session = get_db_connection()
-        
         # Get stream activity threshold (default: last 30 minutes)
         minutes = request.args.get('minutes', 30, type=int)
-        recent_time = datetime.utcnow() - timedelta(minutes=minutes)
+        # Cursor for the next page, as returned in the previous response's next_cursor
+        after_points = request.args.get('after_points', type=float)
+        after_id = request.args.get('after_id')
+        after_position = request.args.get('after_position', 0, type=int)
+        if (after_points is None) != (after_id is None):
+            return jsonify({"error": "after_points and after_id must be given together"}), 400
+        
+        cache_key = (minutes, after_points, after_id, after_position)
+        with leaderboard_cache_lock:
+            cached = leaderboard_cache.get(cache_key)
+        if cached is not None:
+            return Response(cached, mimetype='application/json')
+        
+        now = datetime.utcnow()
+        recent_time = now - timedelta(minutes=minutes)
         
         # Get top 25 recently updated non-eliminated users by points
-        top_users = session.query(User).filter(
-            User.updated_at >= recent_time,
-            User.is_eliminated == False
-        ).order_by(desc(User.points)).limit(25).all()
+        # Closing the connection returns it to the pool
+        with closing(replica_engine.raw_connection()) as conn, closing(conn.cursor()) as cur:
+            if after_id is None:
+                cur.execute(LEADERBOARD_SQL, (recent_time,))
+            else:
+                cur.execute(LEADERBOARD_AFTER_SQL, (recent_time, after_points, after_id))
+            top_users = cur.fetchall()
         
         # Format the response
         leaderboard = [
             {
-                'position': i+1,
-                'username': user.username,
-                'points': round(user.points, 1)  # Round to 1 decimal place
+                'position': position,
+                'username': username,
+                'points': points
             }
-            for i, user in enumerate(top_users)
+            for position, (username, points, _, _) in enumerate(top_users, after_position + 1)
         ]
         
+        # A full page means there may be more rows after it
+        next_cursor = None
+        if len(top_users) == LEADERBOARD_PAGE_SIZE:
+            _, _, last_points, last_id = top_users[-1]
+            next_cursor = {
+                'after_points': last_points,
+                'after_id': last_id,
+                'after_position': after_position + len(top_users)
+            }
+        
         # Add stream status
         status = "active" if len(top_users) > 0 else "inactive"
         
-        return jsonify({
+        body = orjson.dumps({
             'status': status,
             'users': leaderboard,
-            'timestamp': datetime.utcnow().isoformat()
+            'next_cursor': next_cursor,
+            'timestamp': now.isoformat(timespec='seconds')
         })
+        with leaderboard_cache_lock:
+            leaderboard_cache[cache_key] = body
+        
+        return Response(body, mimetype='application/json')
     
     except Exception as e:
         print(f"Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        if 'session' in locals():
-            session.close()
+
+# Status/test responses only differ by timestamp, so serialize them once and
+# just splice the current timestamp into the bytes on each call
+_STATUS_TEMPLATE = orjson.dumps({'status': 'online', 'timestamp': '__TS__'})
+_TEST_TEMPLATE = orjson.dumps({'message': 'API is working', 'timestamp': '__TS__'})
 
 # Simple status endpoint
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    return jsonify({
-        'status': 'online',
-        'timestamp': datetime.utcnow().isoformat()
-    })
+    return Response(_STATUS_TEMPLATE.replace(b'__TS__', current_timestamp().encode()),
+                    mimetype='application/json')
 
 @app.route('/api/test', methods=['GET'])
 def test():
-    return jsonify({
-        'message': 'API is working',
-        'timestamp': datetime.utcnow().isoformat()
-    })
+    return Response(_TEST_TEMPLATE.replace(b'__TS__', current_timestamp().encode()),
+                    mimetype='application/json')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,13 @@
+"""
+Gunicorn settings for the leaderboard API. Run with: gunicorn wsgi:app
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Every request is a single Postgres round-trip, so use async workers that
+# keep many requests in flight per process instead of one at a time
+worker_class = 'gevent'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
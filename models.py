@@ -5,7 +5,7 @@ This file defines the SQLAlchemy models that map to database tables.
 import uuid
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, UniqueConstraint, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -18,31 +18,42 @@ class User(Base):
     
     id = Column(String, primary_key=True)  # YouTube channel ID
     username = Column(String, nullable=False, index=True)  # Added index for username lookups
-    points = Column(Float, default=0.0, index=True)  # Added index for points (used in sorting)
-    is_eliminated = Column(Boolean, default=False, index=True)  # Added index for filtering
+    points = Column(Float, default=0.0)  # Sorted via idx_leaderboard
+    is_eliminated = Column(Boolean, default=False, server_default=text('false'), nullable=False)  # Filtered via idx_leaderboard
     elimination_reason = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Added index for filtering
     
-    # Relationships
-    membership = relationship("Membership", uselist=False, back_populates="user", cascade="all, delete-orphan")
-    inventory_items = relationship("InventoryItem", back_populates="user", cascade="all, delete-orphan")
+    # Relationships (lazy='raise_on_sql' so an accidental access in a loop fails
+    # loudly instead of firing one query per user; load them explicitly with
+    # e.g. .options(selectinload(User.membership)) where they are needed)
+    membership = relationship("Membership", uselist=False, back_populates="user", cascade="all, delete-orphan",
+                              lazy="raise_on_sql")
+    inventory_items = relationship("InventoryItem", back_populates="user", cascade="all, delete-orphan",
+                                   lazy="raise_on_sql")
     controlled_users = relationship("ControlRelationship", 
                                   foreign_keys="ControlRelationship.controller_id",
                                   back_populates="controller",
-                                  cascade="all, delete-orphan")
+                                  cascade="all, delete-orphan",
+                                  lazy="raise_on_sql")
     controlling_user = relationship("ControlRelationship",
                                   foreign_keys="ControlRelationship.target_id",
                                   back_populates="target",
-                                  cascade="all, delete-orphan")
+                                  cascade="all, delete-orphan",
+                                  lazy="raise_on_sql")
     immunity_against = relationship("BuyerImmunity",
                                   foreign_keys="BuyerImmunity.target_id",
                                   back_populates="target",
-                                  cascade="all, delete-orphan")
+                                  cascade="all, delete-orphan",
+                                  lazy="raise_on_sql")
     
-    # Create an index for username lookups (case-insensitive)
     __table_args__ = (
-        Index('idx_username_lower', username),
+        # Partial index matching the leaderboard query shape so Postgres can walk
+        # it in (points, id) order, seek straight to a page's cursor and stop
+        # after the first 25 matching rows
+        Index('idx_leaderboard', points.desc(), id.desc(),
+              postgresql_where=text('is_eliminated = false'),
+              postgresql_include=['username', 'updated_at']),
     )
     
     def __repr__(self) -> str:
@@ -0,0 +1,12 @@
+"""
+WSGI entry point for running the leaderboard API under gunicorn's gevent workers.
+Patching has to happen before Flask/SQLAlchemy/psycopg2 are imported so that
+socket and libpq calls yield to other greenlets instead of blocking the worker.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import psycogreen.gevent
+psycogreen.gevent.patch_psycopg()
+
+from app import app  # noqa: E402